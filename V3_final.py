@@ -1,4 +1,5 @@
 import requests
+from requests.adapters import HTTPAdapter
 import os
 import threading
 import json
@@ -22,7 +23,9 @@ import concurrent.futures
 from urllib.parse import urlparse
 import hashlib
 import pickle
-from threading import Lock
+import zlib
+from dataclasses import dataclass, field
+from threading import Lock, RLock
 import queue
 
 # Load environment variables
@@ -30,9 +33,51 @@ load_dotenv()
 
 # Global browser pool and cache
 browser_pool = queue.Queue()
-cache_lock = Lock()
+cache_lock = RLock()  # Re-entrant so cache_description can prune while holding it
 description_cache = {}
 ai_cache = {}
+CACHE_MAX_AGE_DAYS = 7
+CACHE_MAX_ENTRIES = 5000  # Hard cap on cached descriptions, newest kept
+CACHE_PRUNE_TARGET = 4500  # Prune down to this so inserts past the cap don't re-sort every time
+
+SCRAPER_MAX_WORKERS = 2  # Chrome sessions one LinkedinScraper run may start
+
+# Supabase Postgres (password comes from SUPABASE_DB_PASSWORD)
+DB_SETTINGS = {
+    "host": "aws-0-eu-west-2.pooler.supabase.com",
+    "database": "postgres",
+    "user": "postgres.ddinjwscpzammkrzkdvw",
+    "port": 5432
+}
+
+# OpenRouter model routing: free models in fallback order, hedged after a delay
+OPENROUTER_URL = "https://openrouter.ai/api/v1/chat/completions"
+AI_MODELS = [
+    "qwen/qwen-2.5-72b-instruct:free",
+    "meta-llama/llama-3.3-70b-instruct:free",
+    "mistralai/mistral-7b-instruct:free",
+]
+AI_HEDGE_DEFAULT_DELAY = 45  # Seconds before hedging when a model has no measured latency yet
+AI_HEDGE_MIN_DELAY = 15  # Never hedge sooner than this
+AI_HEDGE_LATENCY_FACTOR = 1.5  # Hedge once a call runs this much longer than the model's usual latency
+AI_REQUEST_TIMEOUT = (5, 90)  # (connect, read) seconds per model call
+http_session = None
+session_lock = Lock()
+model_stats = {}
+stats_lock = Lock()
+
+@dataclass(slots=True)
+class JobRecord:
+    """Scraped job listing; full descriptions are kept separately, keyed by URL hash"""
+    title: str
+    company: str
+    location: str
+    link: str
+    snippet: str = ""  # First 500 chars from the scraper
+    url_hash: str = field(init=False)  # Computed once from link
+
+    def __post_init__(self):
+        self.url_hash = get_url_hash(self.link) if self.link else ""
 
 def init_browser_pool(pool_size=3):
     """Initialize a pool of browser instances"""
@@ -79,12 +124,26 @@ def load_cache():
         print(f"⚠️ Could not load cache: {e}")
         description_cache = {}
 
+def prune_cache(max_entries=CACHE_MAX_ENTRIES):
+    """Drop expired entries and cap the cache size, keeping the newest"""
+    global description_cache
+    with cache_lock:
+        cutoff = datetime.datetime.now() - datetime.timedelta(days=CACHE_MAX_AGE_DAYS)
+        fresh = [(url_hash, data) for url_hash, data in description_cache.items() if data['timestamp'] > cutoff]
+        fresh.sort(key=lambda item: item[1]['timestamp'], reverse=True)
+        description_cache = dict(fresh[:max_entries])
+
 def save_cache():
     """Save description cache to disk"""
+    prune_cache()
     try:
-        with open('description_cache.pkl', 'wb') as f:
-            pickle.dump(description_cache, f)
-        print(f"💾 Saved {len(description_cache)} descriptions to cache")
+        # Hold the lock so concurrent fetches can't change the dict mid-dump,
+        # and write to a temp file so a crash never leaves a truncated cache
+        with cache_lock:
+            with open('description_cache.pkl.tmp', 'wb') as f:
+                pickle.dump(description_cache, f)
+            os.replace('description_cache.pkl.tmp', 'description_cache.pkl')
+            print(f"💾 Saved {len(description_cache)} descriptions to cache")
     except Exception as e:
         print(f"⚠️ Could not save cache: {e}")
 
@@ -95,19 +154,28 @@ def get_cached_description(url):
         if url_hash in description_cache:
             cached_data = description_cache[url_hash]
             # Check if cache is less than 7 days old
-            if (datetime.datetime.now() - cached_data['timestamp']).days < 7:
-                return cached_data['description']
+            if (datetime.datetime.now() - cached_data['timestamp']).days < CACHE_MAX_AGE_DAYS:
+                return decompress_description(cached_data['description'])
+            del description_cache[url_hash]  # Expired
     return None
 
+def decompress_description(data):
+    """Cached descriptions are zlib-compressed; entries from older caches are plain str"""
+    if isinstance(data, bytes):
+        return zlib.decompress(data).decode()
+    return data
+
 def cache_description(url, description):
-    """Cache description with timestamp"""
+    """Cache compressed description with timestamp"""
     with cache_lock:
         url_hash = get_url_hash(url)
         description_cache[url_hash] = {
-            'description': description,
-            'timestamp': datetime.datetime.now(),
-            'url': url
+            'description': zlib.compress(description.encode()),
+            'timestamp': datetime.datetime.now()
         }
+        # Keep long-running processes bounded, not just the saved file
+        if len(description_cache) > CACHE_MAX_ENTRIES:
+            prune_cache(CACHE_PRUNE_TARGET)
 
 def get_full_job_description_optimized(job_link, max_retries=2):
     """
@@ -127,132 +195,251 @@ def get_full_job_description_optimized(job_link, max_retries=2):
         print(f"⚠️ No available browser for: {job_link[:50]}...")
         return None
 
-    for attempt in range(max_retries):
-        try:
-            driver.get(job_link)
-            
-            # Reduced wait time
-            time.sleep(1)
-            
-            # Try to click "Show more" button if it exists
+    try:
+        for attempt in range(max_retries):
             try:
-                show_more_button = WebDriverWait(driver, 3).until(
-                    EC.element_to_be_clickable((By.XPATH, "//button[contains(@aria-label, 'Show more') or contains(text(), 'Show more') or contains(@class, 'show-more')]"))
-                )
-                driver.execute_script("arguments[0].click();", show_more_button)
-                time.sleep(0.5)
-            except:
-                pass
-
-            # Optimized selectors (most common first)
-            description_selectors = [
-                ".jobs-description-content__text",
-                ".jobs-description__content", 
-                ".description__text",
-                "[data-test-id='job-description']",
-                ".jobs-box__html-content",
-                ".job-description",
-                ".description"
-            ]
+                driver.get(job_link)
+            
+                # Reduced wait time
+                time.sleep(1)
             
-            full_description = ""
-            for selector in description_selectors:
+                # Try to click "Show more" button if it exists
                 try:
-                    description_elements = driver.find_elements(By.CSS_SELECTOR, selector)
-                    if description_elements:
-                        full_description = description_elements[0].text.strip()
-                        if len(full_description) > 100:
-                            break
+                    show_more_button = WebDriverWait(driver, 3).until(
+                        EC.element_to_be_clickable((By.XPATH, "//button[contains(@aria-label, 'Show more') or contains(text(), 'Show more') or contains(@class, 'show-more')]"))
+                    )
+                    driver.execute_script("arguments[0].click();", show_more_button)
+                    time.sleep(0.5)
                 except:
-                    continue
+                    pass
+
+                # Optimized selectors (most common first)
+                description_selectors = [
+                    ".jobs-description-content__text",
+                    ".jobs-description__content", 
+                    ".description__text",
+                    "[data-test-id='job-description']",
+                    ".jobs-box__html-content",
+                    ".job-description",
+                    ".description"
+                ]
             
-            if full_description and len(full_description) > 100:
-                # Cache the result
-                cache_description(job_link, full_description)
-                return full_description
+                full_description = ""
+                for selector in description_selectors:
+                    try:
+                        description_elements = driver.find_elements(By.CSS_SELECTOR, selector)
+                        if description_elements:
+                            full_description = description_elements[0].text.strip()
+                            if len(full_description) > 100:
+                                break
+                    except:
+                        continue
             
-        except Exception as e:
-            print(f"Attempt {attempt + 1} failed for {job_link}: {e}")
-            if attempt < max_retries - 1:
-                time.sleep(1)
-        finally:
-            # Return browser to pool
-            if driver:
-                try:
-                    browser_pool.put(driver, timeout=1)
-                except queue.Full:
-                    driver.quit()  # Pool is full, close this instance
+                if full_description and len(full_description) > 100:
+                    # Cache the result
+                    cache_description(job_link, full_description)
+                    return full_description
+            
+            except Exception as e:
+                print(f"Attempt {attempt + 1} failed for {job_link}: {e}")
+                if attempt < max_retries - 1:
+                    time.sleep(1)
+    finally:
+        # Return browser to pool once, after all attempts
+        try:
+            browser_pool.put(driver, timeout=1)
+        except queue.Full:
+            driver.quit()  # Pool is full, close this instance
     
     return None
 
+DESCRIPTION_FETCH_TIMEOUT = 60  # Seconds a caller waits for its batch of description fetches
+
+def prioritize_links(job_links):
+    """Order links for fetching (you can customize this logic)"""
+    return sorted(job_links, key=lambda x: len(x))  # Shorter URLs often = better structured
+
+def collect_description(full_descriptions, link, future, target_descriptions):
+    """Keep a finished fetch if the description is long enough"""
+    try:
+        description = future.result()
+    except Exception as e:
+        print(f"❌ Error processing {link[:50]}...: {e}")
+        return
+    if description and len(description) > 200:
+        full_descriptions[link] = description
+        print(f"✅ ({len(full_descriptions)}/{target_descriptions}) Fetched: {link[:50]}...")
+    else:
+        print(f"⚠️ Low quality description for: {link[:50]}...")
+
 def fetch_descriptions_smart_parallel(job_links, target_descriptions=8, max_workers=4):
     """
     Smart parallel fetching with early termination and quality filtering
     """
     full_descriptions = {}
-    processed = 0
-    
-    # Prioritize jobs (you can customize this logic)
-    prioritized_links = sorted(job_links, key=lambda x: len(x))  # Shorter URLs often = better structured
-    
-    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-        # Submit initial batch
-        futures = {}
-        for i, link in enumerate(prioritized_links[:max_workers * 2]):  # Submit 2x workers initially
-            future = executor.submit(get_full_job_description_optimized, link)
-            futures[future] = link
-        
-        # Process as they complete
-        for future in concurrent.futures.as_completed(futures, timeout=60):
-            link = futures[future]
-            processed += 1
-            
-            try:
-                description = future.result(timeout=10)
-                if description and len(description) > 200:
-                    full_descriptions[link] = description
-                    print(f"✅ ({len(full_descriptions)}/{target_descriptions}) Fetched: {link[:50]}...")
-                    
-                    # Early termination if we have enough quality descriptions
-                    if len(full_descriptions) >= target_descriptions:
-                        print(f"🎯 Target reached! Got {len(full_descriptions)} descriptions")
-                        # Cancel remaining futures
-                        for remaining_future in futures:
-                            if not remaining_future.done():
-                                remaining_future.cancel()
-                        break
-                else:
-                    print(f"⚠️ Low quality description for: {link[:50]}...")
-                    
-                # Submit next job if available and we haven't reached target
-                if processed + len(futures) - processed < len(prioritized_links) and len(full_descriptions) < target_descriptions:
-                    next_idx = max_workers * 2 + (processed - max_workers * 2)
-                    if next_idx < len(prioritized_links):
-                        next_link = prioritized_links[next_idx]
-                        future = executor.submit(get_full_job_description_optimized, next_link)
-                        futures[future] = next_link
-                        
-            except Exception as e:
-                print(f"❌ Error processing {link[:50]}...: {e}")
-            
+    prioritized_links = prioritize_links(job_links)
+
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
+    futures = {}
+    next_idx = 0
+
+    def submit_next():
+        nonlocal next_idx
+        link = prioritized_links[next_idx]
+        next_idx += 1
+        futures[executor.submit(get_full_job_description_optimized, link)] = link
+
+    try:
+        # Submit initial batch, 2x workers
+        while next_idx < min(max_workers * 2, len(prioritized_links)):
+            submit_next()
+
+        deadline = time.time() + DESCRIPTION_FETCH_TIMEOUT
+        while futures and len(full_descriptions) < target_descriptions:
+            done, _ = concurrent.futures.wait(
+                futures, timeout=max(0, deadline - time.time()), return_when=concurrent.futures.FIRST_COMPLETED
+            )
+            if not done:
+                print(f"⏱️ Description fetch timed out with {len(full_descriptions)} descriptions")
+                break
+
+            for future in done:
+                if len(full_descriptions) >= target_descriptions:
+                    break  # Early termination, the rest get cancelled below
+                collect_description(full_descriptions, futures.pop(future), future, target_descriptions)
+                # Refill the freed slot while we still need descriptions
+                if next_idx < len(prioritized_links) and len(full_descriptions) < target_descriptions:
+                    submit_next()
+
             # Small delay to avoid overwhelming LinkedIn
             time.sleep(0.5)
-    
+
+        if len(full_descriptions) >= target_descriptions:
+            print(f"🎯 Target reached! Got {len(full_descriptions)} descriptions")
+    finally:
+        # Fetches nobody will collect should not keep holding browsers
+        for future in futures:
+            future.cancel()
+        executor.shutdown(wait=True)
+
     return full_descriptions
 
-def get_ai_suggestions_cached(combined_desc, job_title_input, job_country, headers):
-    """Get AI suggestions with caching"""
-    # Create hash for this specific request
-    request_hash = hashlib.md5(f"{job_title_input}_{job_country}_{combined_desc[:1000]}".encode()).hexdigest()
-    
-    # Check AI cache
+def get_http_session():
+    """Shared connection-pooled session for OpenRouter calls"""
+    global http_session
+    with session_lock:
+        if http_session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=2, pool_maxsize=len(AI_MODELS) * 2)
+            session.mount("https://", adapter)
+            http_session = session
+    return http_session
+
+def record_model_result(model, latency, ok):
+    """Update rolling latency and error rate for a model"""
+    with stats_lock:
+        stats = model_stats.setdefault(model, {'calls': 0, 'latency': None, 'error_rate': 0.0})
+        stats['calls'] += 1
+        stats['error_rate'] = 0.7 * stats['error_rate'] + 0.3 * (0.0 if ok else 1.0)
+        if ok:
+            # Only successful calls say anything useful about latency
+            stats['latency'] = latency if stats['latency'] is None else 0.7 * stats['latency'] + 0.3 * latency
+
+def rank_models():
+    """Order models: healthy ones by expected latency, then untried, then failing ones"""
+    with stats_lock:
+        def sort_key(item):
+            index, model = item
+            stats = model_stats.get(model)
+            if not stats:
+                return (1, 0, index)
+            if stats['latency'] is None or stats['error_rate'] > 0.5:
+                # Models that have succeeded before still beat ones that never have
+                return (2, stats['latency'] is None, stats['error_rate'], index)
+            # Expected time to a good answer, counting the calls that fail
+            return (0, stats['latency'] / (1 - stats['error_rate']), index)
+        return [model for _, model in sorted(enumerate(AI_MODELS), key=sort_key)]
+
+def get_hedge_delay(model):
+    """Seconds to wait on a model before also asking the next one"""
+    with stats_lock:
+        stats = model_stats.get(model)
+        latency = stats['latency'] if stats else None
+    if latency is None:
+        return AI_HEDGE_DEFAULT_DELAY
+    return max(AI_HEDGE_MIN_DELAY, AI_HEDGE_LATENCY_FACTOR * latency)
+
+def call_model(model, messages, headers, max_tokens, temperature):
+    """Single OpenRouter call; returns the answer text or None"""
+    payload = {
+        "model": model,
+        "messages": messages,
+        "max_tokens": max_tokens,
+        "temperature": temperature
+    }
+    start = time.time()
+    try:
+        response = get_http_session().post(OPENROUTER_URL, headers=headers, data=json.dumps(payload), timeout=AI_REQUEST_TIMEOUT)
+        response.raise_for_status()
+        response_json = response.json()
+        content = None
+        if "choices" in response_json and response_json["choices"]:
+            content = response_json["choices"][0]["message"]["content"]
+    except Exception as e:
+        print(f"⚠️ {model} failed: {e}")
+        content = None
+
+    latency = time.time() - start
+    record_model_result(model, latency, bool(content))
+    if content:
+        print(f"🤖 {model} answered in {latency:.1f}s")
+    return content or None
+
+def route_ai_request(messages, headers, max_tokens=4000, temperature=0.7):
+    """
+    Hedged fan-out over AI_MODELS: start with the best ranked model, add the
+    next one whenever a call fails or runs past its hedge delay, return the first good answer
+    """
+    models = rank_models()
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=len(models))
+    pending = set()
+    next_idx = 0
+    try:
+        while True:
+            if next_idx < len(models):
+                if next_idx > 0:
+                    print(f"🔀 Hedging with {models[next_idx]}...")
+                pending.add(executor.submit(call_model, models[next_idx], messages, headers, max_tokens, temperature))
+                next_idx += 1
+            if not pending:
+                return None
+
+            # Once every model is in flight, just wait for the remaining ones
+            timeout = get_hedge_delay(models[next_idx - 1]) if next_idx < len(models) else None
+            done, pending = concurrent.futures.wait(pending, timeout=timeout, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                content = future.result()
+                if content:
+                    return content
+    finally:
+        # Slower hedged calls finish in the background and still update model_stats
+        executor.shutdown(wait=False, cancel_futures=True)
+
+def get_ai_request_hash(combined_desc, job_title_input, job_country):
+    """Cache key for one AI request"""
+    return hashlib.md5(f"{job_title_input}_{job_country}_{combined_desc[:1000]}".encode()).hexdigest()
+
+def get_cached_ai_suggestions(request_hash):
+    """Return AI suggestions cached in the last 24 hours, if any"""
     if request_hash in ai_cache:
         cache_data = ai_cache[request_hash]
-        if (datetime.datetime.now() - cache_data['timestamp']).hours < 24:  # 24 hour cache
+        if (datetime.datetime.now() - cache_data['timestamp']).total_seconds() < 24 * 3600:  # 24 hour cache
             print("🚀 Using cached AI suggestions!")
             return cache_data['suggestions']
-    
-    # Generate new suggestions
+    return None
+
+def build_ai_messages(combined_desc, job_title_input, job_country):
+    """Chat messages asking for portfolio project suggestions"""
     prompt = f"""
 You are an expert career and AI assistant. Your task is to read FULL job descriptions for roles like "{job_title_input}" and suggest 3 to 5 specific, realistic portfolio projects someone can build to strengthen their application.
 
@@ -282,35 +469,123 @@ Here are the FULL job descriptions to analyze:
 {combined_desc[:12000]}
     """.strip()
 
-    payload = {
-        "model": "qwen/qwen-2.5-72b-instruct:free",
-        "messages": [
-            {"role": "system", "content": "You are an expert career advisor who analyzes complete job descriptions to generate realistic, targeted portfolio project recommendations."},
-            {"role": "user", "content": prompt}
-        ],
-        "max_tokens": 4000,
-        "temperature": 0.7
-    }
+    return [
+        {"role": "system", "content": "You are an expert career advisor who analyzes complete job descriptions to generate realistic, targeted portfolio project recommendations."},
+        {"role": "user", "content": prompt}
+    ]
 
-    try:
-        response = requests.post("https://openrouter.ai/api/v1/chat/completions", headers=headers, data=json.dumps(payload))
-        response_json = response.json()
+def get_ai_suggestions_cached(combined_desc, job_title_input, job_country, headers):
+    """Get AI suggestions with caching"""
+    request_hash = get_ai_request_hash(combined_desc, job_title_input, job_country)
+    cached = get_cached_ai_suggestions(request_hash)
+    if cached:
+        return cached
+
+    messages = build_ai_messages(combined_desc, job_title_input, job_country)
+    suggestions = route_ai_request(messages, headers, max_tokens=4000, temperature=0.7)
+    if suggestions:
+        # Cache the result
+        ai_cache[request_hash] = {
+            'suggestions': suggestions,
+            'timestamp': datetime.datetime.now()
+        }
+    return suggestions
+
+def build_openrouter_headers(api_key):
+    """Request headers for OpenRouter chat completions"""
+    return {
+        "Authorization": f"Bearer {api_key}",
+        "Content-Type": "application/json",
+        "HTTP-Referer": "http://localhost",
+        "X-Title": "JobScraperAI"
+    }
 
-        if "choices" in response_json and response_json["choices"]:
-            suggestions = response_json["choices"][0]["message"]["content"]
-            
-            # Cache the result
-            ai_cache[request_hash] = {
-                'suggestions': suggestions,
-                'timestamp': datetime.datetime.now()
-            }
-            
-            return suggestions
+def create_scraper():
+    """LinkedIn scraper with the pipeline's speed settings"""
+    return LinkedinScraper(
+        chrome_executable_path=None,
+        chrome_binary_location=None,
+        headless=True,
+        slow_mo=1,  # Reduced from 2
+        max_workers=SCRAPER_MAX_WORKERS  # Increased from 1
+    )
+
+def build_job_query(job_title_input, job_country):
+    """Entry-level LinkedIn query for a title and country"""
+    return Query(
+        query=job_title_input,
+        options=QueryOptions(
+            locations=[job_country],
+            limit=12,  # Slightly increased to account for filtering
+            filters=QueryFilters(
+                experience=[
+                    ExperienceLevelFilters.ENTRY_LEVEL,
+                    ExperienceLevelFilters.ASSOCIATE
+                ]
+            )
+        )
+    )
+
+def job_record_from_event(data):
+    """Convert a scraper DATA event into a JobRecord"""
+    return JobRecord(
+        title=data.title,
+        company=data.company,
+        location=data.place or data.company_location,
+        link=data.link,
+        snippet=data.description[:500] if data.description else ""
+    )
+
+def merge_job_descriptions(jobs, existing_descriptions, full_descriptions):
+    """Store each description once, keyed by URL hash; also return the hashes that were newly fetched"""
+    descriptions = {}
+    fetched_hashes = set()
+    for job in jobs:
+        if job.link in full_descriptions:
+            descriptions[job.url_hash] = full_descriptions[job.link]
+            fetched_hashes.add(job.url_hash)
+        elif job.link in existing_descriptions:
+            descriptions[job.url_hash] = existing_descriptions[job.link]
+    return descriptions, fetched_hashes
+
+def select_quality_descriptions(jobs, descriptions):
+    """Full descriptions long enough for AI analysis, in job order"""
+    long_descriptions = []
+    for job in jobs:
+        description = descriptions.get(job.url_hash)
+        if description is not None:
+            if len(description) > 300:  # Quality threshold
+                long_descriptions.append(description)
+                print(f"✅ Quality description for: {job.title}")
         else:
-            return None
-    except Exception as e:
-        print(f"AI call failed: {e}")
-        return None
+            print(f"⚠️ Using fallback for: {job.title}")
+    return long_descriptions
+
+def build_insert_rows(jobs, descriptions, fetched_hashes):
+    """job_listings rows for jobs with newly fetched descriptions"""
+    return [
+        (job.title, job.company, job.location, job.link,
+         descriptions[job.url_hash], datetime.datetime.now())
+        for job in jobs if job.url_hash in fetched_hashes
+    ]
+
+def combine_descriptions(long_descriptions, historical_descriptions):
+    """Combine descriptions (prioritize recent quality ones)"""
+    return "\n\n".join(long_descriptions[:5] + historical_descriptions[:5])
+
+def build_pipeline_result(suggestions, jobs, long_descriptions, historical_descriptions,
+                          existing_descriptions, full_descriptions, start_time, ai_start):
+    """Result dict returned by both pipelines on success"""
+    return {
+        "suggestions": suggestions,
+        "jobs_analyzed": len(jobs),
+        "quality_descriptions": len(long_descriptions),
+        "historical_jobs_used": len(historical_descriptions),
+        "cached_descriptions_used": len(existing_descriptions),
+        "newly_fetched": len(full_descriptions),
+        "total_time": round(time.time() - start_time, 1),
+        "ai_time": round(time.time() - ai_start, 1)
+    }
 
 def check_existing_descriptions(cursor, job_links):
     """Check which jobs already have full descriptions in DB"""
@@ -356,21 +631,13 @@ def run_pipeline(job_title_input, job_country):
         if not OPENROUTER_API_KEY:
             return {"error": "Missing OpenRouter API key."}
 
-        headers = {
-            "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-            "Content-Type": "application/json",
-            "HTTP-Referer": "http://localhost",
-            "X-Title": "JobScraperAI"
-        }
+        headers = build_openrouter_headers(OPENROUTER_API_KEY)
 
         # --- Database Setup ---
         try:
             conn = psycopg2.connect(
-                host="aws-0-eu-west-2.pooler.supabase.com",
-                database="postgres",
-                user="postgres.ddinjwscpzammkrzkdvw",
+                **DB_SETTINGS,
                 password=os.getenv("SUPABASE_DB_PASSWORD"),
-                port=5432,
                 sslmode="require"
             )
             cursor = conn.cursor()
@@ -382,23 +649,10 @@ def run_pipeline(job_title_input, job_country):
         result = {}
         finished_event = threading.Event()
 
-        scraper = LinkedinScraper(
-            chrome_executable_path=None,
-            chrome_binary_location=None,
-            headless=True,
-            slow_mo=1,  # Reduced from 2
-            max_workers=2  # Increased from 1
-        )
+        scraper = create_scraper()
 
         def on_data(data: EventData):
-            job = {
-                "Title": data.title,
-                "Company": data.company,
-                "Location": data.place or data.company_location,
-                "Link": data.link,
-                "Description": data.description[:500] if data.description else ""
-            }
-            jobs.append(job)
+            jobs.append(job_record_from_event(data))
 
         def on_error(error):
             print("❌ Error occurred:", error)
@@ -414,7 +668,7 @@ def run_pipeline(job_title_input, job_country):
             print(f"📊 Scraped {len(jobs)} jobs in {time.time() - start_time:.1f}s")
 
             # Check existing descriptions in DB first
-            job_links = [job["Link"] for job in jobs if job["Link"]]
+            job_links = [job.link for job in jobs if job.link]
             existing_descriptions = check_existing_descriptions(cursor, job_links)
             
             # Only fetch descriptions for jobs we don't have
@@ -433,20 +687,7 @@ def run_pipeline(job_title_input, job_country):
             else:
                 full_descriptions = {}
 
-            # Combine existing and newly fetched descriptions
-            all_descriptions = {**existing_descriptions, **full_descriptions}
-
-            # Update jobs with full descriptions
-            quality_jobs = []
-            for job in jobs:
-                if job["Link"] in all_descriptions:
-                    job["FullDescription"] = all_descriptions[job["Link"]]
-                    if len(job["FullDescription"]) > 300:  # Quality threshold
-                        quality_jobs.append(job)
-                        print(f"✅ Quality description for: {job['Title']}")
-                else:
-                    job["FullDescription"] = job["Description"]
-                    print(f"⚠️ Using fallback for: {job['Title']}")
+            descriptions, fetched_hashes = merge_job_descriptions(jobs, existing_descriptions, full_descriptions)
 
             # Only insert/update jobs with new full descriptions
             if full_descriptions:
@@ -457,11 +698,7 @@ def run_pipeline(job_title_input, job_country):
                         description = EXCLUDED.description,
                         scraped_at = EXCLUDED.scraped_at;
                 """
-                data_tuples = [
-                    (job["Title"], job["Company"], job["Location"], job["Link"], 
-                     job["FullDescription"], datetime.datetime.now())
-                    for job in jobs if job["Link"] in full_descriptions
-                ]
+                data_tuples = build_insert_rows(jobs, descriptions, fetched_hashes)
 
                 try:
                     if data_tuples:
@@ -472,10 +709,7 @@ def run_pipeline(job_title_input, job_country):
                     print(f"⚠️ DB insert warning: {e}")
 
             # Use quality descriptions for AI analysis
-            long_descriptions = [
-                job["FullDescription"] for job in quality_jobs 
-                if len(job["FullDescription"]) > 300
-            ]
+            long_descriptions = select_quality_descriptions(jobs, descriptions)
 
             print(f"📝 Using {len(long_descriptions)} quality descriptions for AI")
 
@@ -495,8 +729,7 @@ def run_pipeline(job_title_input, job_country):
                 historical_descriptions = []
                 print(f"⚠️ No historical descriptions: {e}")
 
-            # Combine descriptions (prioritize recent quality ones)
-            combined_desc = "\n\n".join(long_descriptions[:5] + historical_descriptions[:5])
+            combined_desc = combine_descriptions(long_descriptions, historical_descriptions)
 
             if not combined_desc:
                 result = {"error": "No valid job descriptions to analyze."}
@@ -509,16 +742,10 @@ def run_pipeline(job_title_input, job_country):
             suggestions = get_ai_suggestions_cached(combined_desc, job_title_input, job_country, headers)
             
             if suggestions:
-                result = {
-                    "suggestions": suggestions,
-                    "jobs_analyzed": len(jobs),
-                    "quality_descriptions": len(long_descriptions),
-                    "historical_jobs_used": len(historical_descriptions),
-                    "cached_descriptions_used": len(existing_descriptions),
-                    "newly_fetched": len(full_descriptions),
-                    "total_time": round(time.time() - start_time, 1),
-                    "ai_time": round(time.time() - ai_start, 1)
-                }
+                result = build_pipeline_result(
+                    suggestions, jobs, long_descriptions, historical_descriptions,
+                    existing_descriptions, full_descriptions, start_time, ai_start
+                )
                 print(f"✅ AI analysis completed in {time.time() - ai_start:.1f}s!")
             else:
                 result = {"error": "Failed to generate AI suggestions."}
@@ -535,21 +762,7 @@ def run_pipeline(job_title_input, job_country):
         # --- Run Scraper ---
         try:
             print(f"🔍 Starting optimized scraper for '{job_title_input}' in '{job_country}'...")
-            scraper.run([
-                Query(
-                    query=job_title_input,
-                    options=QueryOptions(
-                        locations=[job_country],
-                        limit=12,  # Slightly increased to account for filtering
-                        filters=QueryFilters(
-                            experience=[
-                                ExperienceLevelFilters.ENTRY_LEVEL,
-                                ExperienceLevelFilters.ASSOCIATE
-                            ]
-                        )
-                    )
-                )
-            ])
+            scraper.run([build_job_query(job_title_input, job_country)])
         except Exception as e:
             return {"error": f"Scraper error: {e}"}
 
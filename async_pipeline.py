@@ -0,0 +1,430 @@
+# async_pipeline.py
+
+import asyncio
+import concurrent.futures
+import datetime
+import os
+import time
+
+import aiohttp
+import asyncpg
+
+from linkedin_jobs_scraper.events import Events
+
+from V3_final import (
+    AI_REQUEST_TIMEOUT,
+    DB_SETTINGS,
+    DESCRIPTION_FETCH_TIMEOUT,
+    OPENROUTER_URL,
+    SCRAPER_MAX_WORKERS,
+    ai_cache,
+    build_ai_messages,
+    build_job_query,
+    browser_pool,
+    build_insert_rows,
+    build_openrouter_headers,
+    build_pipeline_result,
+    collect_description,
+    combine_descriptions,
+    cleanup_browser_pool,
+    create_scraper,
+    get_ai_request_hash,
+    get_cached_ai_suggestions,
+    get_full_job_description_optimized,
+    get_hedge_delay,
+    init_browser_pool,
+    job_record_from_event,
+    load_cache,
+    merge_job_descriptions,
+    prioritize_links,
+    rank_models,
+    record_model_result,
+    save_cache,
+    select_quality_descriptions,
+)
+
+OPENROUTER_MODELS_URL = "https://openrouter.ai/api/v1/models"
+
+# Shared services for every request on the event loop
+http_session = None
+db_pool = None
+selenium_executor = None  # Description fetches, one worker per pooled browser
+scraper_executor = None  # Concurrent LinkedinScraper runs; each starts its own Chrome outside the pool
+services_lock = asyncio.Lock()
+background_tasks = set()  # Hedged AI calls still running after a winner was picked
+
+class SystemCheckError(Exception):
+    """A startup check failed, so the async services were not started"""
+
+async def start_async_services(browser_pool_size=3, scraper_workers=2, db_pool_size=10, http_pool_size=20):
+    """
+    Create the HTTP session, DB pool, browser pool and Selenium executors once per process.
+    Call this at app startup; if any step fails, whatever was created is torn down and the error is raised.
+
+    At most scraper_workers users scrape LinkedIn at the same time; further requests
+    queue for a scraper slot while everything else keeps running on the loop.
+    """
+    global http_session, db_pool, selenium_executor, scraper_executor
+    async with services_lock:
+        if http_session is not None:
+            return
+
+        loop = asyncio.get_running_loop()
+        session = pool = executor = scrape_executor = None
+        try:
+            # Disk and Chrome startup are blocking, keep them off the event loop
+            await loop.run_in_executor(None, load_cache)
+            print("🚀 Initializing browser pool...")
+            await loop.run_in_executor(None, init_browser_pool, browser_pool_size)
+            browsers = browser_pool.qsize()
+            if not browsers:
+                raise SystemCheckError("No browser instances could be started.")
+            # Every fetch holds one pooled browser, so with one worker per browser
+            # a fetch never waits on browser_pool.get
+            executor = concurrent.futures.ThreadPoolExecutor(max_workers=browsers)
+            scrape_executor = concurrent.futures.ThreadPoolExecutor(max_workers=scraper_workers)
+            max_chrome = browsers + scraper_workers * SCRAPER_MAX_WORKERS
+            print(f"🧭 {browsers} pooled browsers, {scraper_workers} concurrent scrapes, at most {max_chrome} Chrome sessions")
+
+            connect_timeout, read_timeout = AI_REQUEST_TIMEOUT
+            session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=http_pool_size),
+                timeout=aiohttp.ClientTimeout(sock_connect=connect_timeout, sock_read=read_timeout)
+            )
+            pool = await asyncpg.create_pool(
+                **DB_SETTINGS,
+                password=os.getenv("SUPABASE_DB_PASSWORD"),
+                ssl="require",
+                min_size=1,
+                max_size=db_pool_size
+            )
+
+            await run_system_check_async(session, pool)
+        except BaseException:
+            print("❌ Async services failed to start, cleaning up...")
+            if session is not None:
+                await session.close()
+            if pool is not None:
+                await pool.close()
+            if executor is not None:
+                executor.shutdown(wait=False)
+            if scrape_executor is not None:
+                scrape_executor.shutdown(wait=False)
+            await loop.run_in_executor(None, cleanup_browser_pool)
+            raise
+
+        # Only publish the services once everything is up
+        http_session, db_pool = session, pool
+        selenium_executor, scraper_executor = executor, scrape_executor
+
+async def stop_async_services():
+    """Close shared services and persist the description cache"""
+    global http_session, db_pool, selenium_executor, scraper_executor
+    async with services_lock:
+        if http_session is None:
+            return
+
+        for task in list(background_tasks):
+            task.cancel()
+        await http_session.close()
+        await db_pool.close()
+
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, scraper_executor.shutdown)
+        await loop.run_in_executor(None, selenium_executor.shutdown)
+        await loop.run_in_executor(None, cleanup_browser_pool)
+        await loop.run_in_executor(None, save_cache)
+        http_session = db_pool = selenium_executor = scraper_executor = None
+
+async def run_system_check_async(session, pool):
+    """Async counterpart of system_checks.run_system_check; raises SystemCheckError instead of exiting"""
+    print("🔍 Running system checks...")
+
+    api_key = os.getenv("OPENROUTER_API_KEY")
+    if not api_key or not api_key.startswith("sk-or-v1-"):
+        raise SystemCheckError("OPENROUTER_API_KEY is missing or invalid in your .env file.")
+
+    try:
+        async with pool.acquire() as conn:
+            await conn.execute("""
+                CREATE TABLE IF NOT EXISTS job_listings (
+                    id SERIAL PRIMARY KEY,
+                    title TEXT,
+                    company TEXT,
+                    location TEXT,
+                    link TEXT UNIQUE,
+                    description TEXT,
+                    scraped_at TIMESTAMP
+                );
+            """)
+        print("✅ Database connection successful.")
+    except Exception as e:
+        raise SystemCheckError(f"Database check failed: {e}") from e
+
+    # Model list is a non-generating endpoint, so the ping costs no free-tier quota
+    try:
+        async with session.get(OPENROUTER_MODELS_URL, headers=build_openrouter_headers(api_key)) as res:
+            if res.status == 429:
+                print("⚠️ OpenRouter is rate limiting right now; continuing.")
+            elif res.status != 200:
+                raise SystemCheckError(f"OpenRouter API error ({res.status}): {await res.text()}")
+            else:
+                print("✅ OpenRouter API is reachable.")
+    except aiohttp.ClientError as e:
+        raise SystemCheckError(f"OpenRouter API check failed: {e}") from e
+    except asyncio.TimeoutError as e:
+        raise SystemCheckError("OpenRouter API check timed out.") from e
+
+    print("✅ All checks passed!\n")
+
+async def call_model_async(model, messages, headers, max_tokens, temperature):
+    """Single OpenRouter call; returns the answer text or None"""
+    payload = {
+        "model": model,
+        "messages": messages,
+        "max_tokens": max_tokens,
+        "temperature": temperature
+    }
+    start = time.time()
+    try:
+        async with http_session.post(OPENROUTER_URL, headers=headers, json=payload) as response:
+            response.raise_for_status()
+            response_json = await response.json()
+        content = None
+        if "choices" in response_json and response_json["choices"]:
+            content = response_json["choices"][0]["message"]["content"]
+    except Exception as e:
+        print(f"⚠️ {model} failed: {e}")
+        content = None
+
+    latency = time.time() - start
+    record_model_result(model, latency, bool(content))
+    if content:
+        print(f"🤖 {model} answered in {latency:.1f}s")
+    return content or None
+
+async def route_ai_request_async(messages, headers, max_tokens=4000, temperature=0.7):
+    """Event-loop version of V3_final.route_ai_request, sharing its model stats"""
+    models = rank_models()
+    pending = set()
+    next_idx = 0
+    try:
+        while True:
+            if next_idx < len(models):
+                if next_idx > 0:
+                    print(f"🔀 Hedging with {models[next_idx]}...")
+                pending.add(asyncio.create_task(call_model_async(models[next_idx], messages, headers, max_tokens, temperature)))
+                next_idx += 1
+            if not pending:
+                return None
+
+            # Once every model is in flight, just wait for the remaining ones
+            timeout = get_hedge_delay(models[next_idx - 1]) if next_idx < len(models) else None
+            done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                content = task.result()
+                if content:
+                    return content
+    finally:
+        # Let slower hedged calls finish so they still update model_stats
+        for task in pending:
+            background_tasks.add(task)
+            task.add_done_callback(background_tasks.discard)
+
+async def get_ai_suggestions_async(combined_desc, job_title_input, job_country, headers):
+    """Get AI suggestions with caching"""
+    request_hash = get_ai_request_hash(combined_desc, job_title_input, job_country)
+    cached = get_cached_ai_suggestions(request_hash)
+    if cached:
+        return cached
+
+    messages = build_ai_messages(combined_desc, job_title_input, job_country)
+    suggestions = await route_ai_request_async(messages, headers, max_tokens=4000, temperature=0.7)
+    if suggestions:
+        # Cache the result
+        ai_cache[request_hash] = {
+            'suggestions': suggestions,
+            'timestamp': datetime.datetime.now()
+        }
+    return suggestions
+
+async def check_existing_descriptions_async(job_links):
+    """Check which jobs already have full descriptions in DB"""
+    if not job_links:
+        return {}
+
+    try:
+        rows = await db_pool.fetch("""
+            SELECT link, description FROM job_listings
+            WHERE link = ANY($1::text[])
+            AND LENGTH(description) > 300
+            AND scraped_at > NOW() - INTERVAL '7 days'
+        """, job_links)
+        existing_descriptions = {row['link']: row['description'] for row in rows}
+        print(f"📚 Found {len(existing_descriptions)} existing full descriptions in DB")
+        return existing_descriptions
+    except Exception as e:
+        print(f"⚠️ Could not check existing descriptions: {e}")
+        return {}
+
+async def fetch_descriptions_async(job_links, target_descriptions=8, max_workers=3):
+    """
+    Event-loop version of V3_final.fetch_descriptions_smart_parallel. Browser work runs on
+    selenium_executor and the waiting happens on the loop, so no thread is held per request.
+    """
+    loop = asyncio.get_running_loop()
+    full_descriptions = {}
+    prioritized_links = prioritize_links(job_links)
+    futures = {}
+    next_idx = 0
+
+    def submit_next():
+        nonlocal next_idx
+        link = prioritized_links[next_idx]
+        next_idx += 1
+        future = selenium_executor.submit(get_full_job_description_optimized, link)
+        futures[asyncio.wrap_future(future, loop=loop)] = link
+
+    try:
+        # Submit initial batch, 2x workers
+        while next_idx < min(max_workers * 2, len(prioritized_links)):
+            submit_next()
+
+        deadline = loop.time() + DESCRIPTION_FETCH_TIMEOUT
+        while futures and len(full_descriptions) < target_descriptions:
+            done, _ = await asyncio.wait(
+                futures, timeout=max(0, deadline - loop.time()), return_when=asyncio.FIRST_COMPLETED
+            )
+            if not done:
+                print(f"⏱️ Description fetch timed out with {len(full_descriptions)} descriptions")
+                break
+
+            for future in done:
+                if len(full_descriptions) >= target_descriptions:
+                    break  # Early termination, the rest get cancelled below
+                collect_description(full_descriptions, futures.pop(future), future, target_descriptions)
+                # Refill the freed slot while we still need descriptions
+                if next_idx < len(prioritized_links) and len(full_descriptions) < target_descriptions:
+                    submit_next()
+
+            # Small delay to avoid overwhelming LinkedIn
+            await asyncio.sleep(0.5)
+
+        if len(full_descriptions) >= target_descriptions:
+            print(f"🎯 Target reached! Got {len(full_descriptions)} descriptions")
+    finally:
+        # Cancelling the wrapper also cancels the executor job if it has not started
+        for future in futures:
+            future.cancel()
+
+    return full_descriptions
+
+def scrape_jobs(job_title_input, job_country):
+    """Blocking LinkedIn scrape; run it on scraper_executor"""
+    jobs = []
+    scraper = create_scraper()
+    scraper.on(Events.DATA, lambda data: jobs.append(job_record_from_event(data)))
+    scraper.on(Events.ERROR, lambda error: print("❌ Error occurred:", error))
+    scraper.run([build_job_query(job_title_input, job_country)])
+    return jobs
+
+async def run_pipeline_async(job_title_input, job_country):
+    """
+    Async version of V3_final.run_pipeline for serving many users from one event loop.
+    Returns the same result dict. Start services with start_async_services() at app
+    startup; otherwise the first request starts them.
+    """
+    start_time = time.time()
+    try:
+        await start_async_services()
+    except Exception as e:
+        return {"error": f"Service startup failed: {e}"}
+    loop = asyncio.get_running_loop()
+
+    OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
+    if not OPENROUTER_API_KEY:
+        return {"error": "Missing OpenRouter API key."}
+    headers = build_openrouter_headers(OPENROUTER_API_KEY)
+
+    # --- Scrape (Selenium, bounded executor) ---
+    try:
+        print(f"🔍 Starting optimized scraper for '{job_title_input}' in '{job_country}'...")
+        jobs = await loop.run_in_executor(scraper_executor, scrape_jobs, job_title_input, job_country)
+    except Exception as e:
+        return {"error": f"Scraper error: {e}"}
+
+    if not jobs:
+        return {"error": "No jobs scraped."}
+    print(f"📊 Scraped {len(jobs)} jobs in {time.time() - start_time:.1f}s")
+
+    # Check existing descriptions in DB first
+    job_links = [job.link for job in jobs if job.link]
+    existing_descriptions = await check_existing_descriptions_async(job_links)
+
+    # Only fetch descriptions for jobs we don't have
+    links_to_fetch = [link for link in job_links if link not in existing_descriptions]
+    if links_to_fetch:
+        print(f"🔍 Need to fetch {len(links_to_fetch)} new descriptions...")
+        fetch_start = time.time()
+        full_descriptions = await fetch_descriptions_async(
+            links_to_fetch,
+            target_descriptions=min(8, len(links_to_fetch)),
+            max_workers=3
+        )
+        print(f"⚡ Fetched descriptions in {time.time() - fetch_start:.1f}s")
+        # Persist new descriptions now rather than only at shutdown
+        await loop.run_in_executor(None, save_cache)
+    else:
+        full_descriptions = {}
+
+    descriptions, fetched_hashes = merge_job_descriptions(jobs, existing_descriptions, full_descriptions)
+
+    # Only insert/update jobs with new full descriptions
+    data_tuples = build_insert_rows(jobs, descriptions, fetched_hashes)
+    if data_tuples:
+        try:
+            await db_pool.executemany("""
+                INSERT INTO job_listings (title, company, location, link, description, scraped_at)
+                VALUES ($1, $2, $3, $4, $5, $6)
+                ON CONFLICT (link) DO UPDATE SET
+                    description = EXCLUDED.description,
+                    scraped_at = EXCLUDED.scraped_at;
+            """, data_tuples)
+            print(f"💾 Updated {len(data_tuples)} jobs in database")
+        except Exception as e:
+            print(f"⚠️ DB insert warning: {e}")
+
+    long_descriptions = select_quality_descriptions(jobs, descriptions)
+    print(f"📝 Using {len(long_descriptions)} quality descriptions for AI")
+
+    # --- Get historical descriptions (limit to save time) ---
+    try:
+        rows = await db_pool.fetch("""
+            SELECT description FROM job_listings
+            WHERE title ILIKE $1 AND LENGTH(description) > 300
+            ORDER BY scraped_at DESC
+            LIMIT 10
+        """, f"%{job_title_input}%")
+        historical_descriptions = [row['description'] for row in rows if row['description']]
+        print(f"📚 Using {len(historical_descriptions)} historical descriptions")
+    except Exception as e:
+        historical_descriptions = []
+        print(f"⚠️ No historical descriptions: {e}")
+
+    combined_desc = combine_descriptions(long_descriptions, historical_descriptions)
+    if not combined_desc:
+        return {"error": "No valid job descriptions to analyze."}
+
+    # --- AI Analysis with caching ---
+    print("🤖 Generating AI suggestions...")
+    ai_start = time.time()
+    suggestions = await get_ai_suggestions_async(combined_desc, job_title_input, job_country, headers)
+    if not suggestions:
+        return {"error": "Failed to generate AI suggestions."}
+
+    print(f"✅ AI analysis completed in {time.time() - ai_start:.1f}s!")
+    print(f"🏁 Total pipeline time: {time.time() - start_time:.1f}s")
+    return build_pipeline_result(
+        suggestions, jobs, long_descriptions, historical_descriptions,
+        existing_descriptions, full_descriptions, start_time, ai_start
+    )
@@ -0,0 +1,75 @@
+# measure_memory.py
+
+import datetime
+import gc
+import pickle
+import sys
+import tracemalloc
+
+import V3_final
+from V3_final import JobRecord, cache_description, get_url_hash, load_cache, prune_cache
+
+def sample_descriptions():
+    """Real descriptions from description_cache.pkl to build a synthetic batch from"""
+    load_cache()
+    descriptions = [V3_final.decompress_description(data['description']) for data in V3_final.description_cache.values()]
+    V3_final.description_cache = {}
+    if not descriptions:
+        sys.exit("❌ description_cache.pkl is empty or missing.")
+    return descriptions
+
+def measure(label, build):
+    """Print traced memory held by whatever build() returns"""
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label}: {current / 2**20:.1f} MiB")
+    return result
+
+def main(num_jobs=10_000):
+    samples = sample_descriptions()
+
+    def link(i):
+        return f"https://uk.linkedin.com/jobs/view/data-analyst-at-company-{i}-{4270000000 + i}"
+
+    def text(i):
+        return f"Ref {i}. {samples[i % len(samples)]}"
+
+    # Shared inputs; the cache builds below create their own copies so stored text is counted
+    links = [link(i) for i in range(num_jobs)]
+    texts = [text(i) for i in range(num_jobs)]
+    print(f"📏 {num_jobs} jobs, descriptions sampled from {len(samples)} cached ones\n")
+
+    # Before: six-key dicts and plain-text cache entries repeating the URL
+    measure("jobs as dicts       ", lambda: [
+        {"Title": f"Data Analyst {i}", "Company": f"Company {i}", "Location": "London, England, United Kingdom",
+         "Link": links[i], "Description": texts[i][:500], "FullDescription": texts[i]}
+        for i in range(num_jobs)
+    ])
+    old_cache = measure("cache, plain text   ", lambda: {
+        get_url_hash(links[i]): {'description': text(i), 'timestamp': datetime.datetime.now(), 'url': link(i)}
+        for i in range(num_jobs)
+    })
+    print(f"pickled, plain text : {len(pickle.dumps(old_cache)) / 2**20:.1f} MiB\n")
+    del old_cache
+
+    # After: JobRecord and compressed cache entries
+    measure("jobs as JobRecord   ", lambda: [
+        JobRecord(f"Data Analyst {i}", f"Company {i}", "London, England, United Kingdom", links[i], texts[i][:500])
+        for i in range(num_jobs)
+    ])
+
+    def build_cache():
+        for i in range(num_jobs):
+            cache_description(links[i], texts[i])
+        return V3_final.description_cache
+    measure("cache, compressed   ", build_cache)
+    print(f"pickled, compressed : {len(pickle.dumps(V3_final.description_cache)) / 2**20:.1f} MiB")
+    prune_cache()
+    print(f"pickled, after prune: {len(pickle.dumps(V3_final.description_cache)) / 2**20:.1f} MiB "
+          f"({len(V3_final.description_cache)} entries)")
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10_000)